@@ -1,14 +1,19 @@
 # app.py
 import os
-from fastapi import FastAPI, Request
+from typing import Optional
+from datetime import date
+from fastapi import FastAPI, Request, HTTPException
+from fastapi.responses import StreamingResponse
 from botbuilder.core import BotFrameworkAdapter, BotFrameworkAdapterSettings, TurnContext
 from botbuilder.schema import Activity, Attachment
 from dotenv import load_dotenv
 import asyncio
 
 from bot.agentic_bot import AgenticBot
-from bot.db import get_software_list, log_request
+from bot.db import get_software_list, log_request, get_request_summary
+from bot.export import export_requests, MEDIA_TYPES
 from bot.tools import install_request
+from bot.mcp_agent import reconcile_servicenow_requests
 
 load_dotenv()
 app = FastAPI()
@@ -74,6 +79,33 @@ async def on_conversation_update(turn_context: TurnContext):
             if member.id != turn_context.activity.recipient.id:
                 await turn_context.send_activity("👋 Hi! I’m your IT assistant. How can I help you today?")
 
+# ---- ServiceNow reconciliation ----
+RECONCILE_INTERVAL = int(os.getenv("RECONCILE_INTERVAL_SECONDS", "900"))
+
+async def reconcile_loop():
+    while True:
+        await asyncio.sleep(RECONCILE_INTERVAL)
+        try:
+            result = await reconcile_servicenow_requests()
+            print(f"ServiceNow reconciliation: {result}")
+        except Exception as e:
+            print(f"ServiceNow reconciliation failed: {e}")
+
+@app.on_event("startup")
+async def start_reconciliation():
+    # Keep a reference so the task isn't garbage-collected while running
+    app.state.reconcile_task = asyncio.create_task(reconcile_loop()) if RECONCILE_INTERVAL > 0 else None
+
+@app.on_event("shutdown")
+async def stop_reconciliation():
+    task = getattr(app.state, "reconcile_task", None)
+    if task:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
 # ---- Endpoint ----
 @app.post("/api/messages")
 async def messages(req: Request):
@@ -88,6 +120,26 @@ async def messages(req: Request):
 
     return {}
 
+# ---- Reporting ----
+@app.get("/api/requests/export")
+def export_requests_endpoint(format: str = "csv", status: Optional[str] = None, user: Optional[str] = None,
+                             since: Optional[date] = None, until: Optional[date] = None):
+    if format not in MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unsupported format '{format}', use csv or ndjson.")
+    chunks = export_requests(format, status=status, user_name=user, since=since, until=until)
+    if chunks is None:
+        raise HTTPException(status_code=503, detail="Database unavailable.")
+    headers = {"Content-Disposition": f"attachment; filename=requests.{format}"}
+    return StreamingResponse(chunks, media_type=MEDIA_TYPES[format], headers=headers)
+
+@app.get("/api/requests/summary")
+def requests_summary(status: Optional[str] = None, user: Optional[str] = None,
+                     since: Optional[date] = None, until: Optional[date] = None):
+    summary = get_request_summary(status=status, user_name=user, since=since, until=until)
+    if summary is None:
+        raise HTTPException(status_code=503, detail="Database unavailable.")
+    return summary
+
 if __name__ == "__main__":
     import uvicorn
     print("🚀 Bot server running at http://127.0.0.1:3978/api/messages")
@@ -1,6 +1,10 @@
 # bot/agentic_bot.py
 import os
+import re
 import json
+import math
+import heapq
+from collections import defaultdict
 from typing import TypedDict, Optional, Literal
 from fuzzywuzzy import process
 from langgraph.graph import StateGraph, END
@@ -26,6 +30,59 @@ def build_adaptive_card(softwares):
         "version": "1.4"
     }
 
+# ---- Catalog candidate retrieval ----
+CATALOG_TOP_K = int(os.getenv("CATALOG_TOP_K", "15"))
+
+def _ngrams(text: str, n: int = 3) -> set:
+    """Word tokens plus padded character n-grams of each token."""
+    grams = set()
+    for token in re.findall(r"[a-z0-9+#]+", text.lower()):
+        grams.add(token)
+        padded = f" {token} "
+        for i in range(len(padded) - n + 1):
+            grams.add(padded[i:i + n])
+    return grams
+
+class CatalogIndex:
+    """
+    Inverted n-gram index over catalog names and winget IDs, so only the
+    top-k relevant entries are sent to the LLM instead of the whole catalog.
+    Grams are IDF-weighted so filler shared by many entries ("install",
+    "tool") doesn't outrank the product name.
+    """
+    def __init__(self, catalog):
+        self.names = [s["name"] for s in catalog]
+        self.postings = defaultdict(list)
+        entry_grams = []
+        for idx, s in enumerate(catalog):
+            # Initials let abbreviations match ("vscode" -> "Visual Studio Code" via "vsc")
+            initials = "".join(w[0] for w in s["name"].split()) if len(s["name"].split()) > 1 else ""
+            grams = _ngrams(f"{s['name']} {s.get('winget_id') or ''} {initials}".replace(".", " "))
+            entry_grams.append(grams)
+            for g in grams:
+                self.postings[g].append(idx)
+        n = len(catalog)
+        self.idf = {g: math.log(n / len(ids)) for g, ids in self.postings.items()}
+        self.norms = [math.sqrt(sum(self.idf[g] ** 2 for g in grams)) or 1.0 for grams in entry_grams]
+
+    def top_k(self, text: str, k: int = CATALOG_TOP_K):
+        # Small catalogs fit in the prompt as-is
+        if len(self.names) <= k:
+            return list(self.names)
+        scores = defaultdict(float)
+        for g in _ngrams(text):
+            weight = self.idf.get(g, 0.0)
+            if weight <= 0:
+                continue
+            for idx in self.postings[g]:
+                scores[idx] += weight ** 2
+        if not scores:
+            # Nothing lexically similar ("I need a browser"): give the LLM a fixed sample to reason over
+            return self.names[:k]
+        # Cosine similarity on IDF-weighted grams; the query norm is the same for every entry
+        ranked = ((score / self.norms[idx], idx) for idx, score in scores.items())
+        return [self.names[idx] for _, idx in heapq.nlargest(k, ranked)]
+
 class AgenticBot:
     def __init__(self, groq_api_key: Optional[str] = None):
         api_key = groq_api_key or os.getenv("GROQ_API_KEY")
@@ -35,6 +92,7 @@ class AgenticBot:
         self.llm = ChatGroq(model="gemma2-9b-it", api_key=api_key)
         self.catalog = list_software()
         self.catalog_names = [s["name"] for s in self.catalog]
+        self.catalog_index = CatalogIndex(self.catalog)
 
         graph = StateGraph(BotState)
         graph.add_node("classify", self._classify_node)
@@ -81,9 +139,13 @@ class AgenticBot:
                 "Respond ONLY with JSON and nothing else."
             )
         )
-        human = HumanMessage(content=f"User message: {user_text}\nAvailable software: {', '.join(self.catalog_names)}")
+        candidates = self.catalog_index.top_k(user_text)
+        human = HumanMessage(content=f"User message: {user_text}\nAvailable software: {', '.join(candidates)}")
         try:
             out = self.llm.invoke([system, human])
+            usage = getattr(out, "usage_metadata", None) or {}
+            print(f"Classify tokens: input={usage.get('input_tokens')} output={usage.get('output_tokens')} "
+                  f"candidates={len(candidates)}/{len(self.catalog_names)}")
             txt = (out.content or "").strip()
             data = json.loads(txt) if txt.startswith("{") else {}
             intent = data.get("intent", "other")
@@ -76,6 +76,9 @@ def populate_software_catalog():
 
 
 # ------------------ Requests ------------------
+# Stamp the first transition to 'installed' for pending -> installed durations
+INSTALLED_AT_SQL = "installed_at=COALESCE(installed_at, CURRENT_TIMESTAMP)"
+
 def log_request(user_name, software_name, winget_id):
     conn = get_connection()
     if not conn:
@@ -96,6 +99,8 @@ def update_request_status(request_id, status):
         return False
     cursor = conn.cursor()
     sql = "UPDATE requests SET status=%s WHERE id=%s"
+    if status == "installed":
+        sql = f"UPDATE requests SET status=%s, {INSTALLED_AT_SQL} WHERE id=%s"
     cursor.execute(sql, (status, request_id))
     conn.commit()
     cursor.close()
@@ -137,9 +142,174 @@ def mark_request_installed(request_id: int):
     if not conn:
         return False
     cursor = conn.cursor()
-    sql = "UPDATE requests SET status='installed' WHERE id=%s"
+    sql = f"UPDATE requests SET status='installed', {INSTALLED_AT_SQL} WHERE id=%s"
     cursor.execute(sql, (request_id,))
     conn.commit()
     cursor.close()
     conn.close()
     return True
+
+
+def get_unreconciled_requests():
+    """
+    Requests with a ServiceNow ticket whose incident has not reached a final
+    state (resolved, canceled or not found); these are the rows the
+    reconciliation job diffs against ServiceNow.
+    """
+    conn = get_connection()
+    if not conn:
+        return []
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("""
+        SELECT id, status, servicenow_ticket_id
+        FROM requests
+        WHERE servicenow_ticket_id IS NOT NULL
+          AND status IN ('pending', 'in_progress', 'installed')
+          AND (servicenow_state IS NULL OR servicenow_state NOT IN ('resolved', 'canceled', 'not_found'))
+    """)
+    results = cursor.fetchall()
+    cursor.close()
+    conn.close()
+    return results
+
+
+BULK_UPDATE_CHUNK = 1000
+
+
+def bulk_update_requests(request_ids, status=None, servicenow_state=None):
+    if not request_ids or (status is None and servicenow_state is None):
+        return True
+    conn = get_connection()
+    if not conn:
+        return False
+    cursor = conn.cursor()
+    assignments, params = [], []
+    if status is not None:
+        assignments.append("status=%s")
+        params.append(status)
+        if status == "installed":
+            assignments.append(INSTALLED_AT_SQL)
+    if servicenow_state is not None:
+        assignments.append("servicenow_state=%s")
+        params.append(servicenow_state)
+    request_ids = list(request_ids)
+    for i in range(0, len(request_ids), BULK_UPDATE_CHUNK):
+        chunk = request_ids[i:i + BULK_UPDATE_CHUNK]
+        placeholders = ", ".join(["%s"] * len(chunk))
+        sql = f"UPDATE requests SET {', '.join(assignments)} WHERE id IN ({placeholders})"
+        cursor.execute(sql, (*params, *chunk))
+    conn.commit()
+    cursor.close()
+    conn.close()
+    return True
+
+
+# ------------------ Export / Reporting ------------------
+EXPORT_COLUMNS = ["id", "user_name", "software_name", "winget_id", "status",
+                  "servicenow_ticket_id", "created_at", "installed_at"]
+
+
+def _request_filters(status=None, user_name=None, since=None, until=None):
+    """WHERE clause for export filters; `since` is inclusive, `until` exclusive."""
+    clauses, params = [], []
+    if status:
+        clauses.append("status=%s")
+        params.append(status)
+    if user_name:
+        clauses.append("user_name=%s")
+        params.append(user_name)
+    if since:
+        clauses.append("created_at >= %s")
+        params.append(since)
+    if until:
+        clauses.append("created_at < %s")
+        params.append(until)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    return where, params
+
+
+def stream_requests(status=None, user_name=None, since=None, until=None, chunk_size=1000):
+    """
+    Run the export query on an unbuffered cursor and return an iterator over
+    the matching rows, so memory stays constant however many rows match.
+    Returns None if the DB is unreachable; the connection is opened and the
+    query executed up front so failures surface before any output is written.
+    """
+    conn = get_connection()
+    if not conn:
+        return None
+    cursor = conn.cursor(dictionary=True, buffered=False)
+    where, params = _request_filters(status, user_name, since, until)
+    try:
+        cursor.execute(f"SELECT {', '.join(EXPORT_COLUMNS)} FROM requests {where} ORDER BY id", params)
+    except Error:
+        conn.close()
+        raise
+    return _iter_rows(conn, cursor, chunk_size)
+
+
+def _iter_rows(conn, cursor, chunk_size):
+    try:
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        # Stopping early leaves unread rows on the connection; drop it rather than drain
+        try:
+            cursor.close()
+        except Error:
+            pass
+        conn.close()
+
+
+def get_request_summary(status=None, user_name=None, since=None, until=None):
+    """
+    Per-software counts, failure rate and median pending -> installed time
+    (seconds), aggregated in MySQL. Returns None if the DB is unreachable.
+
+    The median only covers requests with installed_at set; the column has no
+    backfill for older rows, so `timed_installs` reports the sample size behind it.
+    """
+    conn = get_connection()
+    if not conn:
+        return None
+    cursor = conn.cursor(dictionary=True)
+    where, params = _request_filters(status, user_name, since, until)
+    cursor.execute(f"""
+        WITH filtered AS (
+            SELECT software_name, status, created_at, installed_at
+            FROM requests {where}
+        ),
+        durations AS (
+            SELECT software_name,
+                   TIMESTAMPDIFF(SECOND, created_at, installed_at) AS secs,
+                   ROW_NUMBER() OVER (PARTITION BY software_name
+                                      ORDER BY TIMESTAMPDIFF(SECOND, created_at, installed_at)) AS rn,
+                   COUNT(*) OVER (PARTITION BY software_name) AS cnt
+            FROM filtered
+            WHERE installed_at IS NOT NULL
+        ),
+        medians AS (
+            SELECT software_name, AVG(secs) AS median_install_seconds, MAX(cnt) AS timed_installs
+            FROM durations
+            WHERE rn IN (FLOOR((cnt + 1) / 2), CEIL((cnt + 1) / 2))
+            GROUP BY software_name
+        )
+        SELECT f.software_name,
+               COUNT(*) AS total,
+               SUM(f.status = 'installed') AS installed,
+               SUM(f.status = 'failed') AS failed,
+               SUM(f.status = 'failed') / NULLIF(SUM(f.status IN ('installed', 'failed')), 0) AS failure_rate,
+               m.median_install_seconds,
+               COALESCE(m.timed_installs, 0) AS timed_installs
+        FROM filtered f
+        LEFT JOIN medians m ON m.software_name = f.software_name
+        GROUP BY f.software_name, m.median_install_seconds, m.timed_installs
+        ORDER BY total DESC
+    """, params)
+    results = cursor.fetchall()
+    cursor.close()
+    conn.close()
+    return results
@@ -0,0 +1,56 @@
+# bot/export.py
+import io
+import csv
+import json
+from datetime import date
+from decimal import Decimal
+from .db import EXPORT_COLUMNS, stream_requests
+
+MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+def json_default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+
+def iter_csv(rows, columns=EXPORT_COLUMNS, batch_size=500):
+    """Encode rows as CSV text, flushing every `batch_size` rows."""
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=columns, extrasaction="ignore")
+    writer.writeheader()
+    for i, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if i % batch_size == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+def iter_ndjson(rows, batch_size=500):
+    """Encode rows as newline-delimited JSON, flushing every `batch_size` rows."""
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(row, default=json_default))
+        if len(lines) >= batch_size:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def export_requests(fmt="csv", **filters):
+    """
+    Stream filtered requests rows in the given format ('csv' or 'ndjson').
+    Returns None if the DB is unreachable.
+    """
+    if fmt not in MEDIA_TYPES:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    rows = stream_requests(**filters)
+    if rows is None:
+        return None
+    return iter_csv(rows) if fmt == "csv" else iter_ndjson(rows)
@@ -1,13 +1,30 @@
 # bot/mcp_agent.py
 import os
 import json
+import asyncio
 from dotenv import load_dotenv
 from langchain_mcp_adapters.client import MultiServerMCPClient
 from langchain_groq import ChatGroq
-from .db import update_request_servicenow, update_request_status
+from .db import update_request_servicenow, update_request_status, get_unreconciled_requests, bulk_update_requests
 
 load_dotenv()
 
+RECONCILE_PAGE_SIZE = int(os.getenv("RECONCILE_PAGE_SIZE", "100"))
+RECONCILE_MAX_PAGES = int(os.getenv("RECONCILE_MAX_PAGES", "50"))
+RECONCILE_CONCURRENCY = int(os.getenv("RECONCILE_CONCURRENCY", "5"))
+# Refuse to mark tickets not_found when at least this many, and more than this share, are missing
+RECONCILE_NOT_FOUND_MIN = int(os.getenv("RECONCILE_NOT_FOUND_MIN", "10"))
+RECONCILE_NOT_FOUND_RATIO = float(os.getenv("RECONCILE_NOT_FOUND_RATIO", "0.5"))
+# ServiceNow incident states, raw values and display values
+RESOLVED_STATES = {"6", "7", "resolved", "closed"}
+CANCELED_STATES = {"8", "canceled", "cancelled"}
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking DB call in the default executor, off the event loop."""
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(None, lambda: func(*args, **kwargs))
+
 
 class ServiceNowAgent:
     def __init__(self):
@@ -27,7 +44,7 @@ class ServiceNowAgent:
         if self.tools is None:
             tools = await self.client.get_tools()
             # Only incident-related tools
-            self.tools = {t.name: t for t in tools if t.name in ("create_incident", "update_incident", "resolve_incident")}
+            self.tools = {t.name: t for t in tools if t.name in ("create_incident", "update_incident", "resolve_incident", "list_incidents")}
         return self.tools
 
     async def handle_request(self, request_id: int, user_name: str, software_name: str) -> dict:
@@ -68,11 +85,132 @@ class ServiceNowAgent:
             if isinstance(resp, str):
                 resp = json.loads(resp)
 
-            update_request_status(request_id, "installed")
+            if isinstance(resp, dict) and resp.get("success") is False:
+                # Install itself succeeded; leave the incident tracked so reconciliation retries it
+                await run_blocking(update_request_status, request_id, "installed")
+                return {"success": False, "message": resp.get("message", "resolve_incident failed."), "response": resp}
+
+            await run_blocking(bulk_update_requests, [request_id], status="installed", servicenow_state="resolved")
             return {"success": True, "response": resp}
         except Exception as e:
             return {"success": False, "message": str(e)}
 
+    async def fetch_incident_states(self, wanted_ids) -> tuple:
+        """
+        Page through list_incidents with limit/offset (the only arguments relied on,
+        as in sn_client_test.py) and diff against the wanted sys_ids locally.
+        Returns ({sys_id: state} for the wanted incidents that were seen, exhausted),
+        where `exhausted` is True only if the whole incident list was read, i.e.
+        unseen tickets really are missing. Paging stops early once every wanted
+        incident is seen, or after RECONCILE_MAX_PAGES so a run stays bounded.
+        """
+        list_tool = self.tools.get("list_incidents")
+        wanted_ids = set(wanted_ids)
+        states = {}
+        for page in range(RECONCILE_MAX_PAGES):
+            resp = await list_tool.ainvoke({"limit": RECONCILE_PAGE_SIZE, "offset": page * RECONCILE_PAGE_SIZE})
+            if isinstance(resp, str):
+                resp = json.loads(resp)
+            if isinstance(resp, dict) and resp.get("success") is False:
+                raise RuntimeError(resp.get("message", "list_incidents failed."))
+            incidents = resp.get("incidents", []) if isinstance(resp, dict) else resp
+            for inc in incidents:
+                sys_id = inc.get("sys_id") or inc.get("incident_id")
+                if sys_id in wanted_ids:
+                    states[sys_id] = str(inc.get("state") or "").lower()
+            if len(incidents) < RECONCILE_PAGE_SIZE:
+                # An empty first page means the listing is unusable, not that
+                # every tracked ticket was deleted.
+                return states, page > 0 or bool(incidents)
+            if len(states) == len(wanted_ids):
+                break
+        return states, False
+
+    async def reconcile(self, resolver_name: str = "reconciler") -> dict:
+        """
+        Bring ServiceNow incidents and the requests table back in sync:
+        - installed requests whose incident is still open get resolved in ServiceNow
+        - requests whose incident is resolved, canceled or missing get that final
+          state recorded so later runs skip them; pending/in_progress ones among
+          them are logged for follow-up, their install status is left untouched
+        """
+        await self.load_tools()
+        if not self.tools.get("list_incidents") or not self.tools.get("resolve_incident"):
+            return {"success": False, "message": "list_incidents/resolve_incident tools not available."}
+
+        rows = await run_blocking(get_unreconciled_requests)
+        if not rows:
+            return {"success": True, "resolved_in_servicenow": 0, "updated_in_db": 0, "failed": 0}
+
+        wanted = {r["servicenow_ticket_id"] for r in rows}
+        try:
+            states, exhausted = await self.fetch_incident_states(wanted)
+        except Exception as e:
+            return {"success": False, "message": str(e)}
+
+        # Only trust "missing" after a full listing, and not when most of a large
+        # tracked set vanished at once (more likely the wrong instance or a bad listing).
+        missing = len(wanted) - len(states)
+        mark_not_found = exhausted and not (
+            missing >= RECONCILE_NOT_FOUND_MIN and missing / len(wanted) > RECONCILE_NOT_FOUND_RATIO
+        )
+        if missing and not mark_not_found:
+            print(f"ServiceNow reconciliation: {missing} tracked incident(s) not seen; left for the next run.")
+
+        final = {"resolved": [], "canceled": [], "not_found": []}
+        to_resolve = []
+        for r in rows:
+            state = states.get(r["servicenow_ticket_id"])
+            if state is None:
+                if not mark_not_found:
+                    continue
+                final_state = "not_found"
+            elif state in RESOLVED_STATES:
+                final_state = "resolved"
+            elif state in CANCELED_STATES:
+                final_state = "canceled"
+            else:
+                if r["status"] == "installed":
+                    to_resolve.append(r)
+                continue
+            final[final_state].append(r["id"])
+            if r["status"] != "installed":
+                print(f"Request {r['id']} is '{r['status']}' but ServiceNow ticket "
+                      f"{r['servicenow_ticket_id']} is {final_state}; needs follow-up.")
+
+        resolve_tool = self.tools["resolve_incident"]
+        semaphore = asyncio.Semaphore(RECONCILE_CONCURRENCY)
+
+        async def resolve(row):
+            async with semaphore:
+                try:
+                    resp = await resolve_tool.ainvoke({
+                        "incident_id": row["servicenow_ticket_id"],
+                        "resolution_code": "Resolved by caller",
+                        "resolution_notes": f"Resolved via bot reconciliation by {resolver_name}"
+                    })
+                    if isinstance(resp, str):
+                        resp = json.loads(resp)
+                    if isinstance(resp, dict) and resp.get("success") is False:
+                        return None
+                    return row["id"]
+                except Exception:
+                    return None
+
+        results = await asyncio.gather(*(resolve(r) for r in to_resolve))
+        resolved_ids = [rid for rid in results if rid is not None]
+        final["resolved"].extend(resolved_ids)
+
+        for final_state, ids in final.items():
+            await run_blocking(bulk_update_requests, ids, servicenow_state=final_state)
+
+        return {
+            "success": True,
+            "resolved_in_servicenow": len(resolved_ids),
+            "updated_in_db": sum(len(ids) for ids in final.values()),
+            "failed": len(to_resolve) - len(resolved_ids),
+        }
+
 
 # ---- Helpers ----
 async def create_incident_for_request(request_id, user_name, software_name):
@@ -82,3 +220,7 @@ async def create_incident_for_request(request_id, user_name, software_name):
 async def resolve_request_in_servicenow(request_id, ticket_id, resolver_name):
     agent = ServiceNowAgent()
     return await agent.resolve_request(request_id, ticket_id, resolver_name)
+
+async def reconcile_servicenow_requests():
+    agent = ServiceNowAgent()
+    return await agent.reconcile()
@@ -0,0 +1,52 @@
+# export_requests.py
+import sys
+import json
+import argparse
+from datetime import date
+from bot.db import get_request_summary
+from bot.export import export_requests, MEDIA_TYPES, json_default
+
+
+def iso_date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date '{value}', expected YYYY-MM-DD")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream install request history as CSV or NDJSON.")
+    parser.add_argument("--format", choices=sorted(MEDIA_TYPES), default="csv")
+    parser.add_argument("--status", help="Only requests with this status (e.g. installed, failed)")
+    parser.add_argument("--user", help="Only requests from this user name")
+    parser.add_argument("--since", type=iso_date, help="Created on or after this date (YYYY-MM-DD)")
+    parser.add_argument("--until", type=iso_date, help="Created before this date (YYYY-MM-DD)")
+    parser.add_argument("--output", "-o", help="Output file (default: stdout)")
+    parser.add_argument("--summary", action="store_true",
+                        help="Print per-software summary (counts, failure rate, median install time) instead. "
+                             "The median only covers requests with installed_at set (no backfill for older "
+                             "rows); timed_installs gives the sample size behind it")
+    args = parser.parse_args()
+
+    filters = {"status": args.status, "user_name": args.user, "since": args.since, "until": args.until}
+    # Query before opening the output so a DB failure never leaves an empty export behind
+    result = get_request_summary(**filters) if args.summary else export_requests(args.format, **filters)
+    if result is None:
+        print("Database unavailable.", file=sys.stderr)
+        sys.exit(1)
+
+    out = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+    try:
+        if args.summary:
+            json.dump(result, out, default=json_default, indent=2)
+            out.write("\n")
+        else:
+            for chunk in result:
+                out.write(chunk)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
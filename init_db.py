@@ -54,10 +54,21 @@ def create_tables():
             winget_id VARCHAR(255) NOT NULL,
             status VARCHAR(50) DEFAULT 'pending',
             servicenow_ticket_id VARCHAR(50),
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            servicenow_state VARCHAR(50),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            installed_at TIMESTAMP NULL
         )
         """)
 
+        # Existing requests tables predate the reconciliation/reporting columns
+        for column, definition in (("servicenow_state", "VARCHAR(50)"), ("installed_at", "TIMESTAMP NULL")):
+            cursor.execute("""
+            SELECT COUNT(*) FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA=%s AND TABLE_NAME='requests' AND COLUMN_NAME=%s
+            """, (DB_NAME, column))
+            if cursor.fetchone()[0] == 0:
+                cursor.execute(f"ALTER TABLE requests ADD COLUMN {column} {definition}")
+
         print("Tables 'software_catalog' and 'requests' ensured.")
         cursor.close()
         conn.close()